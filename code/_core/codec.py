@@ -0,0 +1,133 @@
+import gzip
+import json
+import time
+from pathlib import Path
+
+# Optional fast JSON backends, used in this order when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+class JSON:
+    """JSON codec that uses orjson or msgspec when installed and falls back to the stdlib json module."""
+    backends = ["orjson", "msgspec", "json"]
+
+    def __init__(self, backend=None):
+        self.backend = backend or self._default_backend()
+        if self.backend not in self.backends:
+            raise ValueError(f"Unknown JSON backend: {self.backend}")
+        if {"orjson": orjson, "msgspec": msgspec}.get(self.backend, json) is None:
+            raise ImportError(f"JSON backend {self.backend} is not installed")
+
+    def _default_backend(self):
+        if orjson is not None:
+            return "orjson"
+        if msgspec is not None:
+            return "msgspec"
+        return "json"
+
+    def loads(self, data):
+        """Decode JSON from bytes or str."""
+        if self.backend == "orjson":
+            return orjson.loads(data)
+        if self.backend == "msgspec":
+            return msgspec.json.decode(data.encode("utf-8") if isinstance(data, str) else data)
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """Encode an object to UTF-8 JSON bytes."""
+        if self.backend == "orjson":
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+        if self.backend == "msgspec":
+            return msgspec.json.encode(obj)
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def read(self, path):
+        """Read a JSON file, transparently decompressing files ending in .gz."""
+        path = Path(path)
+        raw = path.read_bytes()
+        if path.suffix == ".gz":
+            raw = gzip.decompress(raw)
+        return self.loads(raw)
+
+    def write(self, path, obj, compresslevel=6):
+        """Write an object as JSON, gzip-compressed when the path ends in .gz. Returns the encoded size in bytes."""
+        return self.write_raw(path, self.dumps(obj), compresslevel=compresslevel)
+
+    def write_raw(self, path, raw, compresslevel=6):
+        """Write already encoded JSON bytes, gzip-compressed when the path ends in .gz. Returns len(raw)."""
+        path = Path(path)
+        if path.suffix == ".gz":
+            payload = gzip.compress(raw, compresslevel=compresslevel)
+        else:
+            payload = raw
+
+        # Write to a temp file and swap it in so readers never see a partial file
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(payload)
+        tmp.replace(path)
+        return len(raw)
+
+    def benchmark(self, obj, rounds=5):
+        """
+        Measures encode and decode throughput for an object.
+
+        Args:
+            obj: Any JSON serialisable object (e.g. the CI corpus).
+            rounds (int): Number of encode/decode passes to average over.
+
+        Returns:
+            dict: backend, encoded size and encode/decode throughput in MB/s.
+        """
+        raw = self.dumps(obj)
+        size_mb = len(raw) / (1024 * 1024)
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            self.dumps(obj)
+        encode_s = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            self.loads(raw)
+        decode_s = (time.perf_counter() - start) / rounds
+
+        gz_size_mb = len(gzip.compress(raw, compresslevel=6)) / (1024 * 1024)
+
+        return {
+            "backend": self.backend,
+            "size_mb": round(size_mb, 3),
+            "gzip_size_mb": round(gz_size_mb, 3),
+            "encode_mb_s": round(size_mb / encode_s, 1) if encode_s else None,
+            "decode_mb_s": round(size_mb / decode_s, 1) if decode_s else None
+        }
+
+# Default codec shared by the REST client and the ETL
+codec = JSON()
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python _core/codec.py <corpus file> [rounds]
+    if len(sys.argv) < 2:
+        print("Usage: python _core/codec.py <json or json.gz file> [rounds]")
+        sys.exit(1)
+
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    data = JSON("json").read(sys.argv[1])
+    for backend in JSON.backends:
+        try:
+            result = JSON(backend).benchmark(data, rounds=rounds)
+        except Exception as e:
+            print(f"{backend:8} unavailable ({e})")
+            continue
+        print(
+            f"{result['backend']:8} size={result['size_mb']} MB gzip={result['gzip_size_mb']} MB "
+            f"encode={result['encode_mb_s']} MB/s decode={result['decode_mb_s']} MB/s"
+        )
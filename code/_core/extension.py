@@ -1,5 +1,6 @@
 from email.mime import message
 import _core.globe as globe
+from _core.codec import codec
 import requests
 import time
 from datetime import datetime, timezone
@@ -33,14 +34,14 @@ class RestAPI:
                         if not return_json:
                             return response.content
                         else:
-                            return response.json()
+                            return codec.loads(response.content)
                     except:
                         return True
                 else:
                     if not return_error:
                         self.logger.entry(message = f"Error: {response.status_code}, {response.text}", type="warning", state="run")
                     if return_error:
-                        return response.json()
+                        return codec.loads(response.content)
             except Exception as e:
                 self.logger.entry(message = f"Error: {e}", type="warning", state="run")
             
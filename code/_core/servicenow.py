@@ -10,12 +10,15 @@ class API:
 
         self.base_url = f"https://{globe.variable.get('servicenow', 'instance')}/api/"
 
-    def GET_all_table_records(self, table, encoded_query=None, fields=None, display_value=False, limit=1000):
+    def GET_all_table_records(self, table, encoded_query=None, fields=None, display_value=False, limit=1000, raise_on_error=False):
         offset = 0
         records = []
 
         while True:
             fetched_records = self.GET_table_records(table=table, encoded_query=encoded_query, fields=fields, display_value=display_value, limit=limit, offset=offset)
+            if fetched_records is None and raise_on_error:
+                # A failed page would otherwise silently truncate the result
+                raise Exception(f"Failed to retrieve {table} records at offset {offset}")
             if not fetched_records:
                 break  # No more records to fetch
             records.extend(fetched_records)
@@ -0,0 +1,241 @@
+import os
+import resource
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+import _core.extension as extension
+from ci_suggester.index import Index, catch_up
+from ci_suggester.history import ChangeHistory
+
+DATA_DIR = os.environ.get("CI_SUGGESTER_DATA_DIR", "data")
+MAX_BATCH = int(os.environ.get("CI_SUGGESTER_MAX_BATCH", "5000"))
+CACHE_SIZE = int(os.environ.get("CI_SUGGESTER_CACHE_SIZE", "4096"))
+# Seconds between checks for new corpus deltas (0 disables incremental updates)
+DELTA_POLL = float(os.environ.get("CI_SUGGESTER_DELTA_POLL", "5"))
+# Rebuild from the snapshot once this share of rows are tombstones
+COMPACT_RATIO = float(os.environ.get("CI_SUGGESTER_COMPACT_RATIO", "0.2"))
+MAX_K = 50
+
+class Served:
+    """
+    The index, change history and query cache served together.
+
+    Updates build a new Served and swap the module reference, so a request that captured the
+    current one always sees an index, history rows and cache that belong together.
+    """
+    def __init__(self, index, history, history_mtime=None, cache_base=(0, 0)):
+        self.index = index
+        self.history = history
+        self.history_mtime = history_mtime
+        # Maps index rows to change history rows (-1 when a CI has no history)
+        self.history_rows = np.array([history.rows.get(m.get("sys_id"), -1) for m in index.meta], dtype=np.int64)
+        # Cache counters carried over from the previous Served, so /metrics stays cumulative
+        self.cache_base = cache_base
+        # Cached single-query hits; the change form repeats the same descriptions while users type
+        self.search_cached = lru_cache(maxsize=CACHE_SIZE)(self._search_one)
+
+    def _search_one(self, text, k, filter_key):
+        filters = {name: list(values) for name, values in filter_key} if filter_key else None
+        return self.search([text], k, filters)[0]
+
+    def search(self, texts, k, filters):
+        try:
+            return self.index.search(texts, k=k, filters=filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def cache_stats(self):
+        info = self.search_cached.cache_info()
+        return self.cache_base[0] + info.hits, self.cache_base[1] + info.misses, info.currsize
+
+served = None
+# Age in seconds of the newest delta when it was applied
+freshness = None
+
+def _history_path():
+    path = Path(DATA_DIR) / "ci_history.npz"
+    return path, path.stat().st_mtime if path.exists() else None
+
+def _refresh():
+    """Apply new corpus deltas (or compact) and reload a changed change history, then swap them in."""
+    global served, freshness
+    current = served
+    index, applied, lag = catch_up(current.index if current else None, DATA_DIR, compact_ratio=COMPACT_RATIO)
+    if index is None:
+        return
+
+    path, mtime = _history_path()
+    if current and index is current.index and mtime == current.history_mtime:
+        return
+    history = current.history if current and mtime == current.history_mtime else ChangeHistory.load(path)
+
+    cache_base = current.cache_stats()[:2] if current else (0, 0)
+    served = Served(index, history, mtime, cache_base)
+    if lag is not None:
+        freshness = lag
+    extension.Output().print_log(
+        message=f"[Suggester] Index at delta {index.seq}: {applied} applied, {len(index)} rows, {index.dead} tombstones",
+        type="info"
+    )
+
+def _poll(stop):
+    # With incremental updates disabled this only waits for the first corpus snapshot
+    while not stop.wait(DELTA_POLL if DELTA_POLL > 0 else 5):
+        if DELTA_POLL <= 0 and served is not None:
+            return
+        try:
+            _refresh()
+        except Exception as e:
+            extension.Output().print_log(message=f"[Suggester] Delta refresh failed: {e}", type="warning")
+
+@asynccontextmanager
+async def lifespan(app):
+    global served
+    index_dir = Path(DATA_DIR) / "ci_index"
+    if index_dir.exists():
+        path, mtime = _history_path()
+        served = Served(Index.load(index_dir), ChangeHistory.load(path), mtime)
+    # Catch up with deltas published since the index was saved (or build it from the snapshot)
+    _refresh()
+    if served is None:
+        # The ETL may still be writing its first corpus (e.g. on a fresh docker compose up)
+        extension.Output().print_log(message=f"[Suggester] No index or corpus found in {DATA_DIR} yet, waiting for the ETL", type="warning")
+
+    stop = threading.Event()
+    if DELTA_POLL > 0 or served is None:
+        threading.Thread(target=_poll, args=(stop,), daemon=True).start()
+    yield
+    stop.set()
+
+app = FastAPI(title="CI Suggester", lifespan=lifespan)
+
+class SuggestRequest(BaseModel):
+    text: str
+    k: int = Field(5, ge=1, le=MAX_K)
+    # Optional change stats window and risk half-life, computed from the daily change history
+    days_back: Optional[int] = Field(None, ge=1)
+    half_life_days: Optional[float] = Field(None, gt=0)
+    # Optional facet filters, e.g. {"environment": "prod", "service": ["payments", "billing"]}
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None
+
+class BatchSuggestRequest(BaseModel):
+    texts: List[str]
+    k: int = Field(5, ge=1, le=MAX_K)
+    days_back: Optional[int] = Field(None, ge=1)
+    half_life_days: Optional[float] = Field(None, gt=0)
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None
+
+def _filter_key(filters):
+    """Hashable, order-independent form of the facet filters (used as part of the cache key)."""
+    if not filters:
+        return None
+    return tuple(sorted(
+        (name, tuple(sorted([values] if isinstance(values, str) else values)))
+        for name, values in filters.items()
+    ))
+
+def _history(current, hits_list, request):
+    """
+    Window stats and risk for the returned CIs only, computed in one pass over all queries' hits.
+
+    Returns:
+        tuple: (window, risk) keyed by index row, each None when not requested.
+    """
+    if not request.days_back and not request.half_life_days:
+        return None, None
+    rows = np.unique(np.array([row for hits in hits_list for row, _ in hits], dtype=np.int64))
+    h = current.history_rows[rows] if len(rows) else rows
+    found = h >= 0
+    rows, h = rows[found], h[found]
+
+    window = risk = None
+    if request.days_back:
+        totals = current.history.window(request.days_back, rows=h)
+        window = {int(r): {f: int(v[i]) for f, v in totals.items()} for i, r in enumerate(rows)}
+    if request.half_life_days:
+        values = current.history.risk(request.half_life_days, rows=h)
+        risk = {int(r): round(float(v), 4) for r, v in zip(rows, values)}
+    return window, risk
+
+def _results(current, hits, window=None, risk=None):
+    results = []
+    for row, score in hits:
+        meta = current.index.meta[row]
+        result = {
+            "sys_id": meta.get("sys_id"),
+            "name": meta.get("name"),
+            "score": round(score, 4),
+            "stats": meta.get("stats", {})
+        }
+        if window is not None:
+            result["window"] = window.get(row, {f: 0 for f in ChangeHistory.fields})
+        if risk is not None:
+            result["risk"] = risk.get(row, 0.0)
+        results.append(result)
+    return results
+
+def _served():
+    current = served
+    if current is None:
+        raise HTTPException(status_code=503, detail=f"No index or corpus found in {DATA_DIR} yet")
+    return current
+
+def _rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "cis": len(served.index) if served is not None else 0}
+
+@app.get("/metrics")
+def metrics():
+    current = _served()
+    index = current.index
+    hits, misses, size = current.cache_stats()
+    return {
+        "cis": len(index),
+        "rss_mb": round(_rss_mb(), 1),
+        "index": {"seq": index.seq, "rows": len(index), "tombstones": index.dead, "freshness_s": None if freshness is None else round(freshness, 3)},
+        "cache": {"hits": hits, "misses": misses, "size": size, "max_size": CACHE_SIZE}
+    }
+
+@app.post("/suggest")
+def suggest(request: SuggestRequest):
+    current = _served()
+    start = time.perf_counter()
+    hits = current.search_cached(request.text, request.k, _filter_key(request.filters))
+    return {
+        "results": _results(current, hits, *_history(current, [hits], request)),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+@app.post("/suggest/batch")
+def suggest_batch(request: BatchSuggestRequest):
+    """Scores many change descriptions at once: one query matrix, one sparse product per chunk."""
+    if len(request.texts) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch of {len(request.texts)} exceeds the limit of {MAX_BATCH}")
+
+    current = _served()
+    start = time.perf_counter()
+    hits = current.search(request.texts, request.k, request.filters)
+    window, risk = _history(current, hits, request)
+    elapsed = time.perf_counter() - start
+    return {
+        "results": [_results(current, h, window, risk) for h in hits],
+        "count": len(request.texts),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "queries_per_second": round(len(request.texts) / elapsed, 1) if elapsed else None
+    }
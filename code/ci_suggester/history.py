@@ -0,0 +1,179 @@
+import numpy as np
+from pathlib import Path
+from datetime import datetime, timezone
+
+class ChangeHistory:
+    """
+    Per-CI change counts in daily buckets.
+
+    Counts cover the fields total, success and caused_inc for each CI and day, with day0 (days
+    since the Unix epoch, UTC) as the first day. They are held as prefix sums over the days,
+    shape (3, CIs, days + 1), built once on load. Stats for any look-back window are then a
+    single subtraction, so changing days_back does not need a re-extraction.
+
+    The prefix sums are uint16, so they take no more memory than the counts, unless a CI has
+    65536 or more changes in the retained history, in which case they are uint32.
+    """
+    fields = ("total", "success", "caused_inc")
+
+    def __init__(self, sys_ids=None, day0=None, counts=None):
+        sys_ids = list(sys_ids) if sys_ids is not None else []
+        if counts is None:
+            counts = np.zeros((len(self.fields), len(sys_ids), 0), dtype=np.uint16)
+        self._set(sys_ids, day0, counts)
+
+    def _set(self, sys_ids, day0, counts):
+        self.sys_ids = sys_ids
+        self.rows = {s: i for i, s in enumerate(sys_ids)}
+        self.day0 = day0
+        most = int(counts.sum(axis=2, dtype=np.int64).max()) if counts.size else 0
+        dtype = np.uint16 if most <= np.iinfo(np.uint16).max else np.uint32
+        self.prefix = np.zeros(counts.shape[:2] + (counts.shape[2] + 1,), dtype=dtype)
+        np.cumsum(counts, axis=2, dtype=dtype, out=self.prefix[:, :, 1:])
+
+    @staticmethod
+    def epoch_day(value):
+        """Convert a datetime or a ServiceNow 'YYYY-MM-DD HH:MM:SS' UTC string to days since the epoch."""
+        if isinstance(value, str):
+            value = datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        return int(value.timestamp() // 86400)
+
+    @classmethod
+    def bucket(cls, changes):
+        """Bucket change records by day. Returns {epoch_day: [total, success, caused_inc]}."""
+        buckets = {}
+        for c in changes:
+            ts = c.get("sys_created_on")
+            if not ts:
+                continue
+            day = buckets.setdefault(cls.epoch_day(ts), [0, 0, 0])
+            day[0] += 1
+            if (c.get("close_code") or "").lower() == "successful":
+                day[1] += 1
+            if str(c.get("u_caused_incident", "false")).lower() in ("true", "1"):
+                day[2] += 1
+        return buckets
+
+    @property
+    def counts(self):
+        """Daily counts, shape (3, CIs, days), recovered from the prefix sums."""
+        return np.diff(self.prefix, axis=2).astype(np.uint16)
+
+    @property
+    def days(self):
+        return self.prefix.shape[2] - 1
+
+    @property
+    def last_day(self):
+        return self.day0 + self.days - 1 if self.day0 is not None else None
+
+    def merge(self, buckets, first_day, last_day, retention_days=None):
+        """
+        Merge freshly extracted buckets into the history.
+
+        Days first_day..last_day are replaced for every CI in buckets, older days are kept, so each
+        ETL cycle only appends the new days (and refreshes the overlap it re-extracted).
+
+        Args:
+            buckets (dict): {sys_id: {epoch_day: [total, success, caused_inc]}} as returned by bucket().
+            first_day (int): First epoch day covered by the extraction window.
+            last_day (int): Last epoch day covered by the extraction window.
+            retention_days (int): Keep only this many days up to the last day. CIs without any
+                change left in the kept days are dropped.
+        """
+        sys_ids = list(self.sys_ids)
+        rows = dict(self.rows)
+        for sys_id in buckets:
+            if sys_id not in rows:
+                rows[sys_id] = len(sys_ids)
+                sys_ids.append(sys_id)
+
+        day0 = first_day if self.day0 is None else min(self.day0, first_day)
+        end = last_day if self.day0 is None else max(self.last_day, last_day)
+        counts = np.zeros((len(self.fields), len(sys_ids), end - day0 + 1), dtype=np.uint16)
+        if self.day0 is not None:
+            old_n, offset = len(self.sys_ids), self.day0 - day0
+            counts[:, :old_n, offset:offset + self.days] = self.counts
+
+        replaced = np.fromiter((rows[s] for s in buckets), dtype=np.int64, count=len(buckets))
+        counts[:, replaced, first_day - day0:last_day - day0 + 1] = 0
+
+        cells = [(rows[s], d - day0, v) for s, days in buckets.items() for d, v in days.items() if first_day <= d <= last_day]
+        if cells:
+            r = np.fromiter((c[0] for c in cells), dtype=np.int64, count=len(cells))
+            d = np.fromiter((c[1] for c in cells), dtype=np.int64, count=len(cells))
+            v = np.array([c[2] for c in cells], dtype=np.uint16).T
+            counts[:, r, d] = v
+
+        if retention_days and counts.shape[2] > retention_days:
+            counts = counts[:, :, -retention_days:]
+            day0 = end - retention_days + 1
+        keep = np.flatnonzero(counts.any(axis=(0, 2)))
+        if len(keep) < len(sys_ids):
+            counts = counts[:, keep]
+            sys_ids = [sys_ids[i] for i in keep]
+
+        self._set(sys_ids, day0, counts)
+
+    def _span(self, days_back, end_day):
+        """Prefix columns [start, stop) covering days_back days ending at end_day (inclusive)."""
+        end_day = self.last_day if end_day is None else end_day
+        stop = int(np.clip(end_day - self.day0 + 1, 0, self.days))
+        start = int(np.clip(end_day - days_back + 1 - self.day0, 0, stop))
+        return start, stop
+
+    def window(self, days_back, rows=None, end_day=None):
+        """
+        Change stats over the last days_back days ending at end_day (inclusive).
+
+        Args:
+            days_back (int): Window length in days, clipped to the retained history.
+            rows (array): History rows to compute, e.g. only the CIs being returned. All rows when None.
+            end_day (int): Last epoch day of the window, defaults to the last day in the history.
+
+        Returns:
+            dict: {field: int32 array with one value per requested row}.
+        """
+        n = len(self.sys_ids) if rows is None else len(rows)
+        if self.day0 is None:
+            return {f: np.zeros(n, dtype=np.int32) for f in self.fields}
+        start, stop = self._span(days_back, end_day)
+        prefix = self.prefix if rows is None else self.prefix[:, rows]
+        totals = (prefix[:, :, stop] - prefix[:, :, start]).astype(np.int32)
+        return dict(zip(self.fields, totals))
+
+    def decayed(self, half_life_days, rows=None, end_day=None):
+        """Exponentially time-decayed change counts, weighting a change half_life_days old by 0.5."""
+        n = len(self.sys_ids) if rows is None else len(rows)
+        if self.day0 is None:
+            return {f: np.zeros(n, dtype=np.float32) for f in self.fields}
+        end_day = self.last_day if end_day is None else end_day
+        age = end_day - (self.day0 + np.arange(self.days))
+        weights = np.where(age >= 0, 0.5 ** (age / half_life_days), 0).astype(np.float32)
+        counts = np.diff(self.prefix if rows is None else self.prefix[:, rows], axis=2)
+        return dict(zip(self.fields, counts @ weights))
+
+    def risk(self, half_life_days, rows=None, end_day=None):
+        """Time-decayed share of changes that caused an incident (smoothed so CIs without history score 0)."""
+        d = self.decayed(half_life_days, rows, end_day)
+        return d["caused_inc"] / (d["total"] + 1)
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez_compressed(
+            tmp,
+            sys_ids=np.array(self.sys_ids, dtype=str),
+            day0=np.array(-1 if self.day0 is None else self.day0),
+            counts=self.counts
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        with np.load(path) as data:
+            day0 = int(data["day0"])
+            return cls(data["sys_ids"].tolist(), None if day0 < 0 else day0, data["counts"])
@@ -0,0 +1,306 @@
+import re
+import time
+import numpy as np
+import scipy.sparse as sp
+from pathlib import Path
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from _core.codec import codec
+
+class Index:
+    """TF-IDF index over the CI corpus, held as an L2-normalised sparse matrix with one row per CI."""
+    n_features = 2 ** 20
+    facet_names = ("environment", "service", "ci_class")
+    # Queries are scored in chunks so the dense score block stays bounded (chunk x CIs)
+    chunk_size = 256
+    # Filters keeping at most this share of rows score a sliced matrix; broader ones score every
+    # row and zero the excluded columns, since slicing copies the kept rows on each call
+    slice_ratio = 0.25
+
+    def __init__(self, matrix, idf, df, meta, facets=None, alive=None, seq=0):
+        self.matrix = matrix.tocsr()
+        self.idf = idf
+        self.df = df
+        self.meta = meta
+        # {facet: {value: packed bitmap over index rows}}
+        self.facets = facets if facets is not None else self._build_facets(meta)
+        # Rows replaced or removed by deltas stay in the matrix as tombstones until compaction
+        self.alive = alive if alive is not None else np.ones(len(meta), dtype=bool)
+        # Built once per index so unfiltered queries just zero these columns instead of slicing
+        self.dead_rows = np.flatnonzero(~self.alive)
+        # Sequence number of the last corpus delta reflected in the index
+        self.seq = seq
+        self.rows = {m.get("sys_id"): i for i, m in enumerate(meta) if self.alive[i]}
+        self.vectorizer = self._vectorizer()
+
+    @classmethod
+    def _vectorizer(cls):
+        # Hashing keeps the feature space fixed, so no vocabulary has to be fitted or stored
+        return HashingVectorizer(n_features=cls.n_features, alternate_sign=False, norm=None, dtype=np.float32)
+
+    @classmethod
+    def build(cls, corpus):
+        """Build an index from the ETL corpus (list of {"text", "meta"} records)."""
+        counts = cls._vectorizer().transform([c.get("text") or "" for c in corpus]).tocsr()
+        df = np.bincount(counts.indices, minlength=cls.n_features).astype(np.int32)
+        idf = cls._idf(df, counts.shape[0])
+        matrix = normalize(counts @ sp.diags(idf), norm="l2", copy=False)
+        return cls(matrix, idf, df, [c.get("meta", {}) for c in corpus])
+
+    @classmethod
+    def _build_facets(cls, meta):
+        """Build one bit-packed bitmap per facet value from the corpus meta."""
+        facets = {}
+        for name in cls.facet_names:
+            values = [(m.get("facets") or {}).get(name) or "" for m in meta]
+            uniques, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+            facets[name] = {
+                str(value): np.packbits(codes == code)
+                for code, value in enumerate(uniques) if value
+            }
+        return facets
+
+    def mask(self, filters):
+        """
+        Boolean mask of the index rows matching every facet filter.
+
+        Args:
+            filters (dict): {facet: value or list of values}. Values within a facet are OR-ed,
+                facets are AND-ed. Matching is case-insensitive.
+
+        Returns:
+            np.ndarray | None: Boolean array with one entry per row, or None when there are no filters.
+        """
+        if not filters:
+            return None
+        n = len(self)
+        mask = np.ones(n, dtype=bool)
+        for name, values in filters.items():
+            if name not in self.facets:
+                raise ValueError(f"Unknown facet: {name}")
+            if isinstance(values, str):
+                values = [values]
+            bitmaps = [self.facets[name][v] for v in (str(v).strip().lower() for v in values) if v in self.facets[name]]
+            if not bitmaps:
+                return np.zeros(n, dtype=bool)
+            mask &= np.unpackbits(np.bitwise_or.reduce(bitmaps), count=n).astype(bool)
+        return mask
+
+    @staticmethod
+    def _idf(df, n_docs):
+        # Smoothed idf, same formula as sklearn's TfidfTransformer
+        return (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dead(self):
+        return len(self.dead_rows)
+
+    def apply(self, delta):
+        """
+        Apply a corpus delta ({"seq", "added", "updated", "removed"}) and return the updated index.
+
+        Replaced and removed CIs are tombstoned and their terms dropped from the document
+        frequencies; added and updated CIs are appended as new rows weighted with the current idf.
+        The idf itself is only refreshed by a full rebuild (compaction), which keeps existing rows
+        consistent. A new Index is returned so readers of the old one are never affected.
+        """
+        entries = (delta.get("added") or []) + (delta.get("updated") or [])
+        replaced = set(delta.get("removed") or []) | {e["meta"]["sys_id"] for e in entries}
+        old_rows = np.array(sorted(self.rows[s] for s in replaced if s in self.rows), dtype=np.int64)
+
+        df = self.df.copy()
+        alive = self.alive.copy()
+        if len(old_rows):
+            df -= np.bincount(self.matrix[old_rows].indices, minlength=self.n_features).astype(np.int32)
+            alive[old_rows] = False
+
+        matrix, meta = self.matrix, self.meta
+        if entries:
+            counts = self.vectorizer.transform([e.get("text") or "" for e in entries]).tocsr()
+            df += np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+            matrix = sp.vstack([matrix, normalize(counts @ sp.diags(self.idf), norm="l2", copy=False)], format="csr")
+            meta = meta + [e.get("meta", {}) for e in entries]
+            alive = np.concatenate([alive, np.ones(len(entries), dtype=bool)])
+
+        return Index(matrix, self.idf, df, meta, alive=alive, seq=delta.get("seq", self.seq))
+
+    def transform(self, texts):
+        """Vectorise query texts into one L2-normalised sparse query matrix."""
+        counts = self.vectorizer.transform(texts).tocsr()
+        return normalize(counts @ sp.diags(self.idf), norm="l2", copy=False)
+
+    def search(self, texts, k=5, filters=None):
+        """
+        Scores query texts against every CI with one sparse matrix product per chunk.
+
+        Args:
+            texts (list): Query texts (e.g. change descriptions).
+            k (int): Number of results per query.
+            filters (dict): Optional facet filters (see mask()). Narrow filters prune rows before
+                scoring, so only the matching CIs are scored; broad filters score every row and
+                drop the excluded ones from the scores.
+
+        Returns:
+            list: One list of (row, score) tuples per query, best first. Zero scores are dropped.
+        """
+        mask = self.mask(filters)
+        rows, excluded, matrix = None, None, self.matrix
+        if mask is None:
+            if len(self.dead_rows):
+                excluded = self.dead_rows
+        else:
+            if len(self.dead_rows):
+                mask[self.dead_rows] = False
+            kept = np.flatnonzero(mask)
+            if len(kept) <= self.slice_ratio * len(self):
+                rows, matrix = kept, self.matrix[kept]
+            else:
+                excluded = np.flatnonzero(~mask)
+        if not texts or matrix.shape[0] == 0:
+            return [[] for _ in texts]
+
+        k = max(1, min(k, matrix.shape[0]))
+        queries = self.transform(texts)
+        results = []
+        for start in range(0, queries.shape[0], self.chunk_size):
+            # (CIs x V) @ (V x chunk) keeps the large matrix in its native CSR layout
+            scores = (matrix @ queries[start:start + self.chunk_size].T).T.toarray()
+            if excluded is not None:
+                # Zero scores are dropped by _top_k
+                scores[:, excluded] = 0
+            results.extend(self._top_k(scores, k))
+        if rows is not None:
+            results = [[(int(rows[r]), s) for r, s in hits] for hits in results]
+        return results
+
+    @staticmethod
+    def _top_k(scores, k):
+        # Equal scores rank the lower row first, so hits do not depend on whether rows were sliced
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, kth=k - 1, axis=1)[:, :k]
+            picked = np.take_along_axis(scores, top, axis=1)
+            kth = picked.min(axis=1, keepdims=True)
+            tied = np.count_nonzero(scores == kth, axis=1) > np.count_nonzero(picked == kth, axis=1)
+            # argpartition picks arbitrary rows among those tied for the last places
+            for i in np.flatnonzero(tied & (kth[:, 0] > 0)):
+                above = np.flatnonzero(scores[i] > kth[i])
+                top[i] = np.concatenate([above, np.flatnonzero(scores[i] == kth[i])[:k - len(above)]])
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.lexsort((top, -top_scores), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(int(r), float(s)) for r, s in zip(rows, row_scores) if s > 0]
+            for rows, row_scores in zip(top, top_scores)
+        ]
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        sp.save_npz(index_dir / "matrix.npz", self.matrix)
+        np.save(index_dir / "idf.npy", self.idf)
+        np.save(index_dir / "df.npy", self.df)
+        codec.write(index_dir / "meta.json", self.meta)
+
+        # Facet bitmaps: one packed row per (facet, value), listed in facets.json in the same order
+        names = [[name, value] for name, values in self.facets.items() for value in values]
+        bitmaps = [self.facets[name][value] for name, value in names]
+        np.save(index_dir / "facets.npy", np.array(bitmaps, dtype=np.uint8).reshape(len(bitmaps), (len(self) + 7) // 8))
+        codec.write(index_dir / "facets.json", names)
+        np.save(index_dir / "alive.npy", self.alive)
+        codec.write(index_dir / "index.json", {"seq": self.seq, "rows": len(self), "dead": self.dead})
+
+    @classmethod
+    def load(cls, index_dir):
+        index_dir = Path(index_dir)
+        facets = None
+        if (index_dir / "facets.json").exists():
+            facets = {name: {} for name in cls.facet_names}
+            bitmaps = np.load(index_dir / "facets.npy")
+            for (name, value), bitmap in zip(codec.read(index_dir / "facets.json"), bitmaps):
+                facets.setdefault(name, {})[value] = bitmap
+        state = codec.read(index_dir / "index.json") if (index_dir / "index.json").exists() else {}
+        return cls(
+            sp.load_npz(index_dir / "matrix.npz"),
+            np.load(index_dir / "idf.npy"),
+            np.load(index_dir / "df.npy"),
+            codec.read(index_dir / "meta.json"),
+            facets,
+            np.load(index_dir / "alive.npy") if (index_dir / "alive.npy").exists() else None,
+            state.get("seq", 0)
+        )
+
+def corpus_path(data_dir):
+    """Return the most recently written corpus file (plain or gzip-compressed), or None."""
+    candidates = [p for p in (Path(data_dir) / "ci_corpus.json", Path(data_dir) / "ci_corpus.json.gz") if p.exists()]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: p.stat().st_mtime)
+
+def snapshot_seq(data_dir):
+    """Sequence number of the last delta reflected in the corpus snapshot (0 before the first delta)."""
+    state_path = Path(data_dir) / "deltas" / "snapshot.json"
+    return codec.read(state_path).get("seq", 0) if state_path.exists() else 0
+
+def build_snapshot(data_dir):
+    """Full build from the current corpus snapshot (also used as compaction). Returns None without a corpus."""
+    # Read the sequence number first: if the ETL publishes in between, the next delta is re-applied, which is harmless
+    seq = snapshot_seq(data_dir)
+    path = corpus_path(data_dir)
+    if path is None:
+        return None
+    index = Index.build(codec.read(path))
+    index.seq = seq
+    return index
+
+def pending_deltas(data_dir, seq):
+    """Delta files newer than seq, oldest first, as [(seq, path)]."""
+    deltas = []
+    for path in (Path(data_dir) / "deltas").glob("delta_*.json.gz"):
+        match = re.fullmatch(r"delta_(\d+)\.json\.gz", path.name)
+        if match and int(match.group(1)) > seq:
+            deltas.append((int(match.group(1)), path))
+    return sorted(deltas)
+
+def catch_up(index, data_dir, compact_ratio=0.2):
+    """
+    Bring an index up to date with the published deltas.
+
+    Deltas are applied in sequence order. The index is rebuilt from the snapshot instead when
+    there is no index yet, a delta is missing (pruned by retention), the deltas no longer lead up
+    to the index (the ETL restarted its sequence, e.g. after data/deltas was cleared), or
+    tombstones exceed compact_ratio of the rows.
+
+    Returns:
+        tuple: (index, number of deltas applied, freshness in seconds of the newest delta or None)
+    """
+    if index is None:
+        return build_snapshot(data_dir), 0, None
+
+    # The delta the index was last updated with is gone although the snapshot is behind the index or
+    # newer deltas exist, so those deltas belong to a new sequence
+    if index.seq and not (Path(data_dir) / "deltas" / f"delta_{index.seq:08d}.json.gz").exists():
+        if snapshot_seq(data_dir) < index.seq or pending_deltas(data_dir, index.seq):
+            rebuilt = build_snapshot(data_dir)
+            if rebuilt is None:
+                return index, 0, None
+            index = rebuilt
+
+    applied, freshness = 0, None
+    for seq, path in pending_deltas(data_dir, index.seq):
+        if seq != index.seq + 1:
+            return build_snapshot(data_dir), applied, freshness
+        delta = codec.read(path)
+        index = index.apply(delta)
+        applied += 1
+        if delta.get("created"):
+            freshness = time.time() - delta["created"]
+
+    if len(index) and index.dead / len(index) > compact_ratio:
+        index = build_snapshot(data_dir) or index
+    return index, applied, freshness
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Allow running as a script (python code/ci_suggester/index_build.py) without PYTHONPATH set
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import _core.extension as extension
+from ci_suggester.index import Index, build_snapshot, catch_up, corpus_path
+
+DATA_DIR = os.environ.get("CI_SUGGESTER_DATA_DIR", "data")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CI suggester index from the ETL corpus.")
+    parser.add_argument("--incremental", action="store_true", help="Apply pending corpus deltas to the existing index instead of rebuilding it")
+    args = parser.parse_args()
+
+    index_dir = Path(DATA_DIR) / "ci_index"
+    output = extension.Output()
+    path = corpus_path(DATA_DIR)
+    if path is None:
+        output.print_log(message=f"[Index] No corpus found in {DATA_DIR}", type="error")
+        return False
+
+    start = time.perf_counter()
+    if args.incremental and (index_dir / "index.json").exists():
+        index = Index.load(index_dir)
+        seq = index.seq
+        index, applied, freshness = catch_up(index, DATA_DIR)
+        message = f"[Index] Applied {applied} deltas ({seq} → {index.seq}), {len(index)} rows, {index.dead} tombstones"
+    else:
+        index = build_snapshot(DATA_DIR)
+        message = f"[Index] Indexed {len(index)} CIs from {path} at delta {index.seq}"
+    built = time.perf_counter()
+    index.save(index_dir)
+
+    output.print_log(message=f"{message} (build {built - start:.2f}s, nnz {index.matrix.nnz})", type="success")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
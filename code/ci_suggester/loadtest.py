@@ -0,0 +1,236 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Allow running as a script (python code/ci_suggester/loadtest.py) without PYTHONPATH set
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import requests
+import _core.extension as extension
+from _core.codec import codec
+from ci_suggester.index import corpus_path
+
+DATA_DIR = os.environ.get("CI_SUGGESTER_DATA_DIR", "data")
+
+# Templates for synthetic change descriptions when no corpus is available (or --source synthetic)
+TEMPLATES = [
+    "{action} {component} on {ci}",
+    "{action} {component} for {ci} during maintenance window",
+    "{ci} {component} {action} requested by application team",
+    "Emergency {action} of {component} on {ci} after incident",
+    "Scheduled {action} {component} {ci} {env}"
+]
+ACTIONS = ["patch", "upgrade", "restart", "reboot", "decommission", "resize", "migrate", "reconfigure", "renew"]
+COMPONENTS = ["kernel", "database", "certificate", "firewall rules", "load balancer", "storage volume", "java runtime", "web server", "backup agent"]
+ENVIRONMENTS = ["prod", "test", "dev", "dr"]
+
+class Workload:
+    """Pool of change descriptions replayed by the load generator."""
+    def __init__(self, source="corpus", size=1000, seed=0):
+        self.random = random.Random(seed)
+        corpus = None
+        if source == "corpus":
+            path = corpus_path(DATA_DIR)
+            if path is None:
+                extension.Output().print_log(message=f"[Load] No corpus in {DATA_DIR}, using synthetic descriptions", type="warning")
+            else:
+                corpus = codec.read(path)
+        self.texts = self._from_corpus(corpus, size) if corpus else self._synthetic(size)
+
+    def _from_corpus(self, corpus, size):
+        # A random run of 6-25 tokens from a CI profile reads like a change description naming that CI
+        texts = []
+        for _ in range(size):
+            tokens = (self.random.choice(corpus).get("text") or "").split()
+            if not tokens:
+                continue
+            length = min(len(tokens), self.random.randint(6, 25))
+            start = self.random.randint(0, len(tokens) - length)
+            texts.append(" ".join(tokens[start:start + length]))
+        return texts or self._synthetic(size)
+
+    def _synthetic(self, size):
+        names = [f"{p}{n:03d}" for p in ("srv", "db", "app", "web") for n in range(1, 251)]
+        return [
+            self.random.choice(TEMPLATES).format(
+                action=self.random.choice(ACTIONS),
+                component=self.random.choice(COMPONENTS),
+                ci=self.random.choice(names),
+                env=self.random.choice(ENVIRONMENTS)
+            )
+            for _ in range(size)
+        ]
+
+    def sample(self, n=1):
+        return [self.random.choice(self.texts) for _ in range(n)]
+
+class LoadTest:
+    def __init__(self, url, concurrency=8, rate=0, duration=30, batch_size=0, k=5, sample_interval=1.0, timeout=30):
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.batch_size = batch_size
+        self.k = k
+        self.sample_interval = sample_interval
+        self.timeout = timeout
+
+        self.latencies = []
+        self.errors = 0
+        self.queries = 0
+        self.samples = []
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+
+    def _metrics(self):
+        try:
+            return requests.get(self.url + "/metrics", timeout=self.timeout).json()
+        except Exception:
+            return None
+
+    def _schedule(self):
+        """Next send time for open-loop runs (rate > 0), None for closed-loop runs."""
+        if not self.rate:
+            return None
+        with self._lock:
+            slot = self._next
+            self._next += 1
+        return self.start + slot / self.rate
+
+    def _worker(self, workload):
+        session = requests.Session()
+        while not self._stop.is_set():
+            scheduled = self._schedule()
+            if scheduled is not None:
+                if scheduled >= self.end:
+                    return
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent = time.perf_counter()
+            if sent >= self.end:
+                return
+
+            if self.batch_size:
+                texts = workload.sample(self.batch_size)
+                path, body = "/suggest/batch", {"texts": texts, "k": self.k}
+            else:
+                texts = workload.sample()
+                path, body = "/suggest", {"text": texts[0], "k": self.k}
+            try:
+                response = session.post(self.url + path, data=codec.dumps(body), headers={"Content-Type": "application/json"}, timeout=self.timeout)
+                ok = response.ok
+            except Exception:
+                ok = False
+
+            # Open-loop latency counts from the scheduled send time so server queueing is not hidden
+            latency = time.perf_counter() - (scheduled if scheduled is not None else sent)
+            with self._lock:
+                if ok:
+                    self.latencies.append(latency)
+                    self.queries += len(texts)
+                else:
+                    self.errors += 1
+
+    def _monitor(self):
+        while not self._stop.wait(self.sample_interval):
+            m = self._metrics()
+            if m:
+                self.samples.append({
+                    "t": round(time.perf_counter() - self.start, 2),
+                    "rss_mb": m.get("rss_mb"),
+                    "cache_hits": m.get("cache", {}).get("hits"),
+                    "cache_misses": m.get("cache", {}).get("misses")
+                })
+
+    def run(self, workload):
+        before = self._metrics()
+        if before is None:
+            raise Exception(f"Suggester not reachable at {self.url}")
+
+        self.start = time.perf_counter()
+        self.end = self.start + self.duration
+        monitor = threading.Thread(target=self._monitor, daemon=True)
+        monitor.start()
+        workers = [threading.Thread(target=self._worker, args=(workload,), daemon=True) for _ in range(self.concurrency)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - self.start
+        self._stop.set()
+        monitor.join()
+        after = self._metrics() or before
+
+        return self._report(before, after, elapsed)
+
+    def _report(self, before, after, elapsed):
+        latencies_ms = np.array(self.latencies) * 1000
+        hits = after["cache"]["hits"] - before["cache"]["hits"]
+        misses = after["cache"]["misses"] - before["cache"]["misses"]
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (None, None, None)
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "queries": self.queries,
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_second": round(len(self.latencies) / elapsed, 1),
+            "queries_per_second": round(self.queries / elapsed, 1),
+            "latency_ms": {
+                "p50": None if p50 is None else round(float(p50), 3),
+                "p95": None if p95 is None else round(float(p95), 3),
+                "p99": None if p99 is None else round(float(p99), 3),
+                "max": round(float(latencies_ms.max()), 3) if len(latencies_ms) else None
+            },
+            "cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "rss_mb": {"start": before.get("rss_mb"), "end": after.get("rss_mb")},
+            "memory": self.samples
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay change descriptions against a local CI suggester.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--rate", type=float, default=0, help="Target requests per second in total (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=30, help="Run time in seconds")
+    parser.add_argument("--batch-size", type=int, default=0, help="Texts per /suggest/batch request (0 = single /suggest requests)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--source", choices=["corpus", "synthetic"], default="corpus")
+    parser.add_argument("--unique", type=int, default=1000, help="Distinct descriptions in the replay pool")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="Build label stored with the results (e.g. a git commit)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workload = Workload(source=args.source, size=args.unique, seed=args.seed)
+    test = LoadTest(args.url, concurrency=args.concurrency, rate=args.rate, duration=args.duration, batch_size=args.batch_size, k=args.k)
+    report = test.run(workload)
+
+    output = extension.Output()
+    output.print_log(
+        message=f"[Load] {report['requests']} requests ({report['errors']} errors) in {report['elapsed_s']}s: "
+                f"{report['requests_per_second']} req/s, {report['queries_per_second']} queries/s",
+        type="success" if not report["errors"] else "warning"
+    )
+    output.print_log(message=f"[Load] Latency ms p50={report['latency_ms']['p50']} p95={report['latency_ms']['p95']} p99={report['latency_ms']['p99']}", type="info")
+    output.print_log(message=f"[Load] Cache hit rate {report['cache_hit_rate']}, RSS {report['rss_mb']['start']} → {report['rss_mb']['end']} MB", type="info")
+
+    if args.output:
+        result = {
+            "label": args.label,
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "config": vars(args),
+            "report": report
+        }
+        codec.write(args.output, result)
+        output.print_log(message=f"[Load] Results written to {args.output}", type="info")
+
+if __name__ == "__main__":
+    main()
@@ -24,9 +24,7 @@ def main():
         globe.error = True
         traceback.print_exc() 
     
-    p = process.Process().run()
-
-    # Run the main process(es) 
+    # Run the main process(es); a failed cycle is logged and the next one resumes from the ETL checkpoint
     while (globe.error == False):
         try:
             p = process.Process().run()
@@ -1,6 +1,8 @@
 import _core.globe as globe
 import _core.servicenow as serveicenow
-import os, json
+from _core.codec import codec
+from ci_suggester.history import ChangeHistory
+import os, time, shutil, hashlib, re
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
@@ -11,26 +13,62 @@ class Process:
         self.max_changes_per_ci = int(globe.variable.get('ci_suggester', 'max_changes_per_ci'))
         self.days_back = int(globe.variable.get('ci_suggester', 'days_back'))
         self.data_dir = globe.variable.get('ci_suggester', 'data_dir')
+        self.compress_corpus = str(globe.variable.get('ci_suggester', 'compress_corpus') or "false").lower() in ("true", "1", "yes")
+        # A checkpoint_every of 0 or less disables checkpointing
+        self.checkpoint_every = int(globe.variable.get('ci_suggester', 'checkpoint_every') or 200)
+        self.checkpoint_max_age_hours = float(globe.variable.get('ci_suggester', 'checkpoint_max_age_hours') or 24)
+        self.checkpoint_dir = Path(self.data_dir) / "etl_checkpoint"
+        self.history_days = int(globe.variable.get('ci_suggester', 'history_days') or 365)
+        self.delta_retention = max(2, int(globe.variable.get('ci_suggester', 'delta_retention') or 100))
+        self.delta_dir = Path(self.data_dir) / "deltas"
     
     def run(self):
         # Build encoded date string in SN format (UTC, naive string)
-        since_dt = datetime.now(timezone.utc) - timedelta(days=self.days_back)
+        # Aligned to UTC midnight so the first daily history bucket is a whole day
+        now = datetime.now(timezone.utc)
+        since_dt = (now - timedelta(days=self.days_back)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # Resume an interrupted run, keeping the query window it started with
+        checkpoint = self._load_checkpoint()
+        if checkpoint:
+            now = self._parse_utc(checkpoint["now"])
+            since_dt = self._parse_utc(checkpoint["since"])
         since_str = since_dt.strftime("%Y-%m-%d %H:%M:%S")
 
         # 1) Pull CIs (using your encoded query)
         ci_eq = "active=true"
-        ci_records = self.servicenow.GET_all_table_records(table=self.ci_table, encoded_query=ci_eq) or []
+        ci_records = self.servicenow.GET_all_table_records(table=self.ci_table, encoded_query=ci_eq, raise_on_error=True) or []
         globe.logger.entry(
             message=f"[ETL] Retrieved {len(ci_records)} CIs from {self.ci_table}",
             type="debug"
         )
 
-        corpus = []
-        processed = 0
+        if checkpoint:
+            # CIs deactivated since the checkpoint was written are dropped from the resumed corpus
+            active = {ci.get("sys_id") for ci in ci_records}
+            corpus, history_buckets, completed = self._load_shards(checkpoint, active)
+            globe.logger.entry(
+                message=f"[ETL] Resuming checkpoint from {checkpoint['updated']}: {len(corpus)} CIs already processed "
+                        f"({len(completed) - len(corpus)} no longer active)",
+                type="info"
+            )
+        else:
+            corpus, history_buckets, completed = [], {}, set()
+            checkpoint = {
+                "days_back": self.days_back,
+                "ci_table": self.ci_table,
+                "max_changes_per_ci": self.max_changes_per_ci,
+                "since": since_str,
+                "now": now.strftime("%Y-%m-%d %H:%M:%S"),
+                "shards": [],
+                "updated": None
+            }
+        shard_start = len(corpus)
+        processed = len(corpus)
 
         for ci in ci_records:
             ci_id = ci.get("sys_id")
-            if not ci_id:
+            if not ci_id or ci_id in completed:
                 continue
 
             # 2) Pull related changes (last N days)
@@ -39,7 +77,8 @@ class Process:
             ch_records = self.servicenow.GET_all_table_records(
                 table="change_request",
                 encoded_query=ch_eq,
-                fields=ch_fields
+                fields=ch_fields,
+                raise_on_error=True
             ) or []
 
             # Latest change timestamp (string as returned by SN)
@@ -56,6 +95,9 @@ class Process:
                 if ts and (last_change is None or ts > last_change):
                     last_change = ts
 
+            # Daily change buckets for the per-CI history
+            history_buckets[ci_id] = ChangeHistory.bucket(ch_records)
+
             # Build CI text profile
             # Include common fields + last MAX_CHANGES_PER_CI change texts (most recent first)
             ch_sorted = sorted(ch_records, key=lambda x: x.get("sys_created_on") or "", reverse=True)
@@ -80,6 +122,12 @@ class Process:
                 "meta": {
                     "sys_id": ci_id,
                     "name": ci.get("name", ""),
+                    # Structured filter values, indexed as facet bitmaps by the index builder
+                    "facets": {
+                        "environment": self._facet_value(ci.get("u_environment")),
+                        "service": self._facet_value(ci.get("u_service")),
+                        "ci_class": self._facet_value(ci.get("sys_class_name"))
+                    },
                     "stats": {
                         "total": len(ch_records),
                         "success": sum(1 for c in ch_records if (c.get("close_code") or "").lower() == "successful"),
@@ -90,17 +138,169 @@ class Process:
             })
 
             processed += 1
-            if processed % 200 == 0:
+            if self.checkpoint_every > 0 and processed % self.checkpoint_every == 0:
+                self._save_checkpoint(checkpoint, corpus[shard_start:], history_buckets)
+                shard_start = len(corpus)
                 globe.logger.entry(
                     message=f"[ETL] Processed {processed}/{len(ci_records)} CIs",
                     type="debug"
                 )
 
-        # Write corpus
-        (Path(self.data_dir) / "ci_corpus.json").write_text(
-            json.dumps(corpus, ensure_ascii=False), encoding="utf-8"
+        # Publish the changes since the last published delta before the snapshot, so consumers never miss a delta
+        seq = self._publish_delta(corpus)
+
+        # Write corpus (gzip-compressed when compress_corpus is set)
+        corpus_path = Path(self.data_dir) / ("ci_corpus.json.gz" if self.compress_corpus else "ci_corpus.json")
+        start = time.perf_counter()
+        raw = codec.dumps(corpus)
+        encoded = time.perf_counter()
+        codec.write_raw(corpus_path, raw)
+        written = time.perf_counter()
+        encoded_mb = len(raw) / (1024 * 1024)
+        encode_s, write_s = encoded - start, written - encoded
+        globe.logger.entry(
+            message=f"[ETL] Wrote {len(corpus)} CI profiles → {corpus_path} "
+                    f"({encoded_mb:.1f} MB JSON, encode {encoded_mb / encode_s if encode_s else 0:.1f} MB/s via {codec.backend}, "
+                    f"write {encoded_mb / write_s if write_s else 0:.1f} MB/s)",
+            type="debug"
         )
+        # Sequence number the snapshot reflects, written after it so a failed write keeps the previous pair
+        codec.write(self.delta_dir / "snapshot.json", {"seq": seq})
+
+        # Merge this window's buckets into the per-CI change history
+        history_path = Path(self.data_dir) / "ci_history.npz"
+        history = ChangeHistory.load(history_path)
+        history.merge(history_buckets, ChangeHistory.epoch_day(since_dt), ChangeHistory.epoch_day(now), retention_days=self.history_days)
+        history.save(history_path)
         globe.logger.entry(
-            message=f"[ETL] Wrote {len(corpus)} CI profiles → {(Path(self.data_dir) / 'ci_corpus.json')}",
+            message=f"[ETL] Updated change history for {len(history_buckets)} CIs → {history_path} ({len(history.sys_ids)} CIs with changes, {history.days} days)",
             type="debug"
         )
+
+        # The run is complete, a later run starts a fresh window
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        return True
+
+    def _publish_delta(self, corpus):
+        """
+        Write the added, updated and removed CI profiles since the last published delta as a numbered delta.
+
+        Profiles are compared by a hash of their encoded JSON. The fingerprints a delta leads to are
+        written as fingerprints_<seq> right before delta_<seq> and only count once that delta exists,
+        so the next cycle diffs against what consumers have applied even if this one fails before
+        the snapshot is written. The first cycle only records fingerprints (sequence 0).
+
+        Returns:
+            int: Sequence number of the published delta.
+        """
+        self.delta_dir.mkdir(parents=True, exist_ok=True)
+        fingerprints = {c["meta"]["sys_id"]: hashlib.blake2b(codec.dumps(c), digest_size=8).hexdigest() for c in corpus}
+
+        deltas = self._delta_seqs("delta")
+        published = [s for s in self._delta_seqs("fingerprints") if s == 0 or s in deltas]
+        if not published:
+            codec.write(self.delta_dir / f"fingerprints_{0:08d}.json.gz", fingerprints)
+            return 0
+        previous = codec.read(self.delta_dir / f"fingerprints_{max(published):08d}.json.gz")
+
+        # Fingerprints left behind by an interrupted cycle without their delta are overwritten
+        seq = max(published) + 1
+        delta = {
+            "seq": seq,
+            "created": time.time(),
+            "added": [c for c in corpus if c["meta"]["sys_id"] not in previous],
+            "updated": [c for c in corpus if previous.get(c["meta"]["sys_id"]) not in (None, fingerprints[c["meta"]["sys_id"]])],
+            "removed": [ci_id for ci_id in previous if ci_id not in fingerprints]
+        }
+        codec.write(self.delta_dir / f"fingerprints_{seq:08d}.json.gz", fingerprints)
+        codec.write(self.delta_dir / f"delta_{seq:08d}.json.gz", delta)
+        globe.logger.entry(
+            message=f"[ETL] Published delta {seq}: {len(delta['added'])} added, {len(delta['updated'])} updated, {len(delta['removed'])} removed",
+            type="debug"
+        )
+
+        # Keep the last delta_retention deltas (at least this one and the previous, which consumers check
+        # to tell a new sequence from pruning); consumers further behind rebuild from the snapshot
+        for old in deltas:
+            if old <= seq - self.delta_retention:
+                (self.delta_dir / f"delta_{old:08d}.json.gz").unlink(missing_ok=True)
+        for old in self._delta_seqs("fingerprints"):
+            if old < seq:
+                (self.delta_dir / f"fingerprints_{old:08d}.json.gz").unlink(missing_ok=True)
+        return seq
+
+    def _delta_seqs(self, prefix):
+        """Sequence numbers of the <prefix>_<seq>.json.gz files in the delta directory."""
+        matches = (re.fullmatch(rf"{prefix}_(\d+)\.json\.gz", p.name) for p in self.delta_dir.glob(f"{prefix}_*.json.gz"))
+        return {int(m.group(1)) for m in matches if m}
+
+    @staticmethod
+    def _facet_value(value):
+        # Reference fields come back as {"link", "value"} when not using display values
+        if isinstance(value, dict):
+            value = value.get("value")
+        return str(value or "").strip().lower()
+
+    @staticmethod
+    def _parse_utc(value):
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+    def _load_checkpoint(self):
+        """Return the saved checkpoint if it belongs to a resumable run with the same settings, else None."""
+        state_path = self.checkpoint_dir / "state.json"
+        if not state_path.exists():
+            return None
+        try:
+            checkpoint = codec.read(state_path)
+        except Exception as e:
+            globe.logger.entry(message=f"[ETL] Ignoring unreadable checkpoint: {e}", type="warning")
+            return None
+
+        age = datetime.now(timezone.utc) - self._parse_utc(checkpoint["updated"])
+        settings = {"days_back": self.days_back, "ci_table": self.ci_table, "max_changes_per_ci": self.max_changes_per_ci}
+        if any(checkpoint.get(key) != value for key, value in settings.items()):
+            reason = "settings changed"
+        elif age > timedelta(hours=self.checkpoint_max_age_hours):
+            reason = f"older than {self.checkpoint_max_age_hours} hours"
+        else:
+            return checkpoint
+
+        globe.logger.entry(message=f"[ETL] Discarding checkpoint ({reason}), starting a new run", type="info")
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        return None
+
+    def _load_shards(self, checkpoint, active):
+        """
+        Load the checkpointed corpus entries and change buckets for the CIs in active.
+
+        Returns:
+            tuple: (corpus, history_buckets, set of every sys_id in the shards, active or not)
+        """
+        corpus, history_buckets, completed = [], {}, set()
+        for name in checkpoint["shards"]:
+            shard = codec.read(self.checkpoint_dir / name)
+            completed.update(c["meta"]["sys_id"] for c in shard["corpus"])
+            corpus.extend(c for c in shard["corpus"] if c["meta"]["sys_id"] in active)
+            for ci_id, days in shard["history"].items():
+                if ci_id in active:
+                    history_buckets[ci_id] = {d[0]: d[1:] for d in days}
+        return corpus, history_buckets, completed
+
+    def _save_checkpoint(self, checkpoint, corpus_part, history_buckets):
+        """Write the CIs processed since the last checkpoint as a shard, then record it in the state file."""
+        if not corpus_part:
+            return
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        ci_ids = [c["meta"]["sys_id"] for c in corpus_part]
+        name = f"shard_{len(checkpoint['shards']) + 1:05d}.json.gz"
+        codec.write(self.checkpoint_dir / name, {
+            "corpus": corpus_part,
+            # JSON object keys must be strings, so day buckets are stored as [day, total, success, caused_inc]
+            "history": {ci_id: [[d, *v] for d, v in history_buckets[ci_id].items()] for ci_id in ci_ids}
+        })
+
+        # The state file is written last so it never references a shard that is not on disk. It only
+        # lists the shards, the completed CIs are read back from them on resume
+        checkpoint["shards"].append(name)
+        checkpoint["updated"] = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        codec.write(self.checkpoint_dir / "state.json", checkpoint)
@@ -0,0 +1,52 @@
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "code"))
+
+import _core.globe as globe
+import process.ci_suggester.etl as etl
+
+class Logger:
+    def entry(self, message, type="info", **kwargs):
+        pass
+
+class FakeAPI:
+    """
+    Serves the given CIs (sys_id -> name) with one change request per CI, dated at the start of the
+    queried window. Raises like an exhausted retry loop once fail_after change queries were served.
+    """
+    def __init__(self, cis, fail_after=None):
+        self.cis = cis
+        self.fail_after = fail_after
+        self.change_queries = []
+
+    def GET_all_table_records(self, table, encoded_query=None, fields=None, raise_on_error=False, **kwargs):
+        if table == "cmdb_ci":
+            return [{"sys_id": sys_id, "name": name, "description": f"{name} server", "u_environment": "prod"} for sys_id, name in self.cis.items()]
+        if self.fail_after is not None and len(self.change_queries) >= self.fail_after:
+            raise Exception("Maximum retries reached")
+        self.change_queries.append(encoded_query)
+        since = re.search(r"sys_created_on>=(.+)$", encoded_query).group(1)
+        return [{"sys_id": f"chg-{len(self.change_queries)}", "sys_created_on": since, "close_code": "successful"}]
+
+@pytest.fixture
+def etl_config(tmp_path, monkeypatch):
+    """Fresh [ci_suggester] settings writing to tmp_path; tests may add or override keys."""
+    variable = globe.Variable()
+    for key, value in {"ci_table": "cmdb_ci", "max_changes_per_ci": "5", "days_back": "30", "data_dir": str(tmp_path)}.items():
+        variable.add("ci_suggester", key, value)
+    monkeypatch.setattr(globe, "variable", variable)
+    monkeypatch.setattr(globe, "logger", Logger())
+    return variable
+
+@pytest.fixture
+def run_cycle(etl_config):
+    """Run one ETL cycle against a FakeAPI, given as such or as its CIs."""
+    def run(api):
+        process = etl.Process()
+        process.servicenow = api if isinstance(api, FakeAPI) else FakeAPI(api)
+        return process.run()
+    return run
@@ -0,0 +1,30 @@
+import gzip
+
+import pytest
+
+import _core.codec as codec
+
+@pytest.mark.parametrize("backend", ["orjson", "msgspec"])
+def test_missing_backend_fails_on_construction(backend, monkeypatch):
+    monkeypatch.setattr(codec, backend, None)
+    with pytest.raises(ImportError, match=f"JSON backend {backend} is not installed"):
+        codec.JSON(backend)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown JSON backend: yaml"):
+        codec.JSON("yaml")
+
+def test_default_backend_falls_back_to_stdlib(monkeypatch):
+    monkeypatch.setattr(codec, "orjson", None)
+    monkeypatch.setattr(codec, "msgspec", None)
+    assert codec.JSON().backend == "json"
+
+def test_write_read_round_trip(tmp_path):
+    data = [{"text": "café server", "meta": {"sys_id": "c1", "stats": {"total": 3}}}]
+    json_codec = codec.JSON("json")
+    assert json_codec.write(tmp_path / "corpus.json", data) == len(json_codec.dumps(data))
+    json_codec.write(tmp_path / "corpus.json.gz", data)
+
+    assert json_codec.read(tmp_path / "corpus.json") == data
+    assert json_codec.loads(gzip.decompress((tmp_path / "corpus.json.gz").read_bytes())) == data
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+import pytest
+
+import process.ci_suggester.etl as etl
+from ci_suggester.history import ChangeHistory
+from conftest import FakeAPI
+
+CIS = {f"c{i}": f"server-{i}" for i in range(1, 6)}
+
+def test_resume_fetches_remaining_cis_with_the_original_window(tmp_path, etl_config, run_cycle):
+    etl_config.add("ci_suggester", "checkpoint_every", "2")
+
+    # c1 and c2 are checkpointed, c3 is processed but lost, c4 runs out of retries
+    with pytest.raises(Exception, match="Maximum retries"):
+        run_cycle(FakeAPI(CIS, fail_after=3))
+    state_path = tmp_path / "etl_checkpoint" / "state.json"
+    checkpoint = etl.codec.read(state_path)
+    assert "completed" not in checkpoint
+
+    # Move the saved window back two days so reusing it is distinguishable from starting over
+    for key in ("since", "now"):
+        checkpoint[key] = (etl.Process._parse_utc(checkpoint[key]) - timedelta(days=2)).strftime("%Y-%m-%d %H:%M:%S")
+    etl.codec.write(state_path, checkpoint)
+
+    # c1 is deactivated before the rerun
+    api = FakeAPI({k: v for k, v in CIS.items() if k != "c1"})
+    assert run_cycle(api)
+    assert api.change_queries == [f"cmdb_ci={ci_id}^sys_created_on>={checkpoint['since']}" for ci_id in ("c3", "c4", "c5")]
+
+    corpus = etl.codec.read(tmp_path / "ci_corpus.json")
+    assert [c["meta"]["sys_id"] for c in corpus] == ["c2", "c3", "c4", "c5"]
+    history = ChangeHistory.load(tmp_path / "ci_history.npz")
+    assert (history.day0, history.last_day) == (ChangeHistory.epoch_day(checkpoint["since"]), ChangeHistory.epoch_day(checkpoint["now"]))
+    assert sorted(history.sys_ids) == ["c2", "c3", "c4", "c5"]
+    assert not (tmp_path / "etl_checkpoint").exists()
+
+def test_checkpoint_every_zero_disables_checkpoints(tmp_path, etl_config, run_cycle):
+    etl_config.add("ci_suggester", "checkpoint_every", "0")
+    with pytest.raises(Exception, match="Maximum retries"):
+        run_cycle(FakeAPI(CIS, fail_after=3))
+    assert not (tmp_path / "etl_checkpoint").exists()
+
+    api = FakeAPI(CIS)
+    assert run_cycle(api)
+    assert len(api.change_queries) == len(CIS)
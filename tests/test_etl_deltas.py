@@ -0,0 +1,74 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+import process.ci_suggester.etl as etl
+from ci_suggester.index import build_snapshot, catch_up
+
+def _live(index):
+    return {index.meta[row]["sys_id"]: index.meta[row]["name"] for row in index.rows.values()}
+
+def test_interrupted_cycle_keeps_deltas_consistent(tmp_path, monkeypatch, run_cycle):
+    cis = {"c1": "alpha", "c2": "bravo", "c3": "charlie", "c4": "delta"}
+    run_cycle(cis)
+    index = build_snapshot(tmp_path)
+    assert index.seq == 0
+
+    # Delta 1 (c4 removed, c2 renamed) is published, then the snapshot write fails
+    write_raw = etl.codec.write_raw
+    def failing_write_raw(path, raw, **kwargs):
+        if Path(path).name.startswith("ci_corpus"):
+            raise OSError("disk full")
+        return write_raw(path, raw, **kwargs)
+    monkeypatch.setattr(etl.codec, "write_raw", failing_write_raw)
+    with pytest.raises(OSError):
+        run_cycle({"c1": "alpha", "c2": "bravo-2", "c3": "charlie"})
+    monkeypatch.setattr(etl.codec, "write_raw", write_raw)
+    assert build_snapshot(tmp_path).seq == 0
+
+    # The next cycle restores both and must diff against delta 1, not the stale snapshot
+    run_cycle(cis)
+    snapshot = build_snapshot(tmp_path)
+    assert snapshot.seq == 2
+
+    index, applied, _ = catch_up(index, tmp_path, compact_ratio=1.0)
+    assert applied == 2
+    assert index.seq == 2
+    assert _live(index) == _live(snapshot) == cis
+
+def test_unchanged_cycle_publishes_empty_delta(tmp_path, run_cycle):
+    cis = {"c1": "alpha", "c2": "bravo"}
+    run_cycle(cis)
+    run_cycle(cis)
+    deltas = tmp_path / "deltas"
+    assert sorted(p.name for p in deltas.glob("fingerprints_*")) == ["fingerprints_00000001.json.gz"]
+
+    delta = etl.codec.read(deltas / "delta_00000001.json.gz")
+    assert (delta["added"], delta["updated"], delta["removed"]) == ([], [], [])
+
+def test_restarted_sequence_rebuilds_from_snapshot(tmp_path, run_cycle):
+    cis = {"c1": "alpha", "c2": "bravo", "c3": "charlie", "c4": "delta"}
+    run_cycle(cis)
+    run_cycle({"c1": "alpha", "c2": "bravo", "c3": "charlie"})
+    run_cycle(cis)
+    index, _, _ = catch_up(build_snapshot(tmp_path), tmp_path)
+    assert index.seq == 2
+
+    # data/deltas is cleared; the ETL starts over at 0 and publishes delta 1 of the new sequence
+    shutil.rmtree(tmp_path / "deltas")
+    run_cycle({"c1": "alpha", "c2": "bravo", "c3": "charlie"})
+    index, _, _ = catch_up(index, tmp_path)
+    assert _live(index) == {"c1": "alpha", "c2": "bravo", "c3": "charlie"}
+
+    run_cycle({"c1": "alpha", "c2": "bravo"})
+    index, _, _ = catch_up(index, tmp_path)
+    assert index.seq == 1
+    assert _live(index) == _live(build_snapshot(tmp_path)) == {"c1": "alpha", "c2": "bravo"}
+
+    # A saved index from further along the old sequence is rebuilt once newer deltas appear
+    stale, _, _ = catch_up(build_snapshot(tmp_path), tmp_path)
+    stale.seq = 5
+    run_cycle({"c1": "alpha"})
+    index, _, _ = catch_up(stale, tmp_path)
+    assert _live(index) == {"c1": "alpha"}
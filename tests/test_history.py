@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from ci_suggester.history import ChangeHistory
+
+DAY0 = 20000
+
+def _history(counts, day0=DAY0):
+    return ChangeHistory([f"c{i}" for i in range(counts.shape[1])], day0, counts)
+
+def _random_counts(ci_count=6, days=40, seed=0):
+    rng = np.random.default_rng(seed)
+    total = rng.integers(0, 20, size=(ci_count, days))
+    success = rng.integers(0, total + 1)
+    caused = rng.integers(0, total + 1)
+    return np.stack([total, success, caused]).astype(np.uint16)
+
+def test_window_matches_naive_sum():
+    counts = _random_counts()
+    history = _history(counts)
+    for days_back, end_day in [(1, None), (7, None), (30, DAY0 + 20), (100, None), (5, DAY0 + 2)]:
+        end = history.last_day if end_day is None else end_day
+        lo = max(0, end - days_back + 1 - DAY0)
+        expected = counts[:, :, lo:end - DAY0 + 1].sum(axis=2)
+        window = history.window(days_back, end_day=end_day)
+        for i, field in enumerate(ChangeHistory.fields):
+            assert window[field].tolist() == expected[i].tolist()
+
+    rows = np.array([4, 1])
+    assert history.window(7, rows=rows)["total"].tolist() == counts[0, rows, -7:].sum(axis=1).tolist()
+
+def test_risk_matches_naive_decay():
+    counts = _random_counts()
+    history = _history(counts)
+    half_life = 10.0
+    age = np.arange(counts.shape[2])[::-1]
+    weights = 0.5 ** (age / half_life)
+    total = (counts[0] * weights).sum(axis=1)
+    caused = (counts[2] * weights).sum(axis=1)
+
+    assert history.risk(half_life) == pytest.approx(caused / (total + 1), rel=1e-5)
+    rows = np.array([3, 0])
+    assert history.risk(half_life, rows=rows) == pytest.approx((caused / (total + 1))[rows], rel=1e-5)
+
+def test_overlapping_merge_replaces_reextracted_days():
+    history = ChangeHistory()
+    history.merge({"a": {DAY0: [2, 1, 0], DAY0 + 1: [3, 3, 1]}, "b": {DAY0: [1, 1, 0]}}, DAY0, DAY0 + 1)
+
+    # The second extraction covers day 1 again and adds day 2: day 1 is replaced, day 0 is kept
+    history.merge({"a": {DAY0 + 1: [1, 0, 0], DAY0 + 2: [4, 2, 2]}, "c": {DAY0 + 2: [1, 0, 1]}}, DAY0 + 1, DAY0 + 2)
+
+    assert history.sys_ids == ["a", "b", "c"]
+    assert (history.day0, history.days) == (DAY0, 3)
+    assert history.counts[0].tolist() == [[2, 1, 4], [1, 0, 0], [0, 0, 1]]
+    assert history.window(3)["caused_inc"].tolist() == [2, 0, 1]
+    assert history.window(2, end_day=DAY0 + 1)["success"].tolist() == [1, 1, 0]
+
+def test_retention_trims_days_and_drops_empty_cis():
+    history = ChangeHistory()
+    history.merge({"old": {DAY0: [5, 5, 0]}, "both": {DAY0: [1, 0, 0], DAY0 + 9: [2, 1, 1]}}, DAY0, DAY0 + 9)
+    history.merge({"new": {DAY0 + 12: [1, 1, 0]}}, DAY0 + 10, DAY0 + 12, retention_days=5)
+
+    assert (history.day0, history.days, history.last_day) == (DAY0 + 8, 5, DAY0 + 12)
+    assert history.sys_ids == ["both", "new"]
+    assert history.rows == {"both": 0, "new": 1}
+    assert history.window(365)["total"].tolist() == [2, 1]
+
+def test_window_total_above_uint16_range():
+    counts = np.zeros((3, 2, 5), dtype=np.uint16)
+    counts[0, 0] = 30000
+    counts[0, 1] = 3
+    history = _history(counts)
+
+    assert history.window(5)["total"].tolist() == [150000, 15]
+    assert history.window(3, end_day=DAY0 + 3)["total"].tolist() == [90000, 9]
+    assert history.counts.tolist() == counts.tolist()
+    # Small histories keep the compact prefix sums
+    assert _history(_random_counts()).prefix.dtype == np.uint16
+
+def test_save_load_round_trip(tmp_path):
+    counts = _random_counts()
+    history = _history(counts)
+    path = tmp_path / "ci_history.npz"
+    history.save(path)
+    loaded = ChangeHistory.load(path)
+
+    assert loaded.sys_ids == history.sys_ids
+    assert (loaded.day0, loaded.days) == (history.day0, history.days)
+    assert loaded.counts.tolist() == counts.tolist()
+    assert loaded.window(7)["total"].tolist() == history.window(7)["total"].tolist()
+
+    empty = ChangeHistory.load(tmp_path / "missing.npz")
+    assert empty.day0 is None and empty.window(7)["total"].tolist() == []
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import _core.codec as codec
+import ci_suggester.app as app
+from ci_suggester.index import Index
+
+ENVIRONMENTS = ("prod", "test", "dev")
+SERVICES = ("payments", "billing", "search", "")
+WORDS = "server database cluster node payments billing search shared linux windows oracle queue cache gateway".split()
+
+def _corpus(n=60):
+    # Random bags of words, so scores do not tie and the ranking is fully determined
+    rng = np.random.default_rng(0)
+    return [
+        {
+            "text": " ".join(rng.choice(WORDS, size=rng.integers(4, 12))) + f" host{i}",
+            "meta": {
+                "sys_id": f"c{i}",
+                "name": f"server-{i}",
+                "facets": {"environment": ENVIRONMENTS[i % 3], "service": SERVICES[i % 4], "ci_class": "cmdb_ci_server"}
+            }
+        }
+        for i in range(n)
+    ]
+
+def _rows(index, **facets):
+    """Rows whose meta facets match, with values OR-ed per facet and facets AND-ed."""
+    return [
+        i for i, m in enumerate(index.meta)
+        if all(m["facets"][name] in values for name, values in facets.items())
+    ]
+
+def _search(index, texts, filters, slice_ratio):
+    index.slice_ratio = slice_ratio
+    return index.search(texts, k=10, filters=filters)
+
+def test_mask_ors_values_and_ands_facets_case_insensitively():
+    index = Index.build(_corpus())
+
+    mask = index.mask({"environment": ["PROD", " Test "], "service": "Payments"})
+    assert np.flatnonzero(mask).tolist() == _rows(index, environment=("prod", "test"), service=("payments",))
+    assert index.mask(None) is None
+
+    # Values that do not occur, and an empty value list, match nothing
+    assert not index.mask({"environment": ["staging"]}).any()
+    assert not index.mask({"environment": []}).any()
+    assert not index.mask({"environment": "prod", "service": []}).any()
+
+def test_unknown_facet_raises():
+    index = Index.build(_corpus())
+    with pytest.raises(ValueError, match="Unknown facet: owner"):
+        index.mask({"owner": "alice"})
+
+def test_unknown_facet_is_a_bad_request(tmp_path, monkeypatch):
+    codec.codec.write(tmp_path / "ci_corpus.json", _corpus())
+    monkeypatch.setattr(app, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "DELTA_POLL", 0)
+    monkeypatch.setattr(app, "served", None)
+    with TestClient(app.app) as client:
+        response = client.post("/suggest", json={"text": "database", "filters": {"owner": "alice"}})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unknown facet: owner"
+
+        response = client.post("/suggest/batch", json={"texts": ["database"], "filters": {"environment": "prod"}})
+        assert response.status_code == 200
+        assert {r["sys_id"] for r in response.json()["results"][0]} <= {f"c{i}" for i in _rows(app.served.index, environment=("prod",))}
+
+@pytest.mark.parametrize("filters", [
+    {"environment": "prod", "service": "payments"},
+    {"environment": ["prod", "test"]},
+    {"service": ["payments", "billing", "search"]},
+    {"ci_class": "cmdb_ci_server"},
+    {"environment": "dev", "service": "nothing"},
+])
+def test_sliced_and_masked_search_agree(filters):
+    index = Index.build(_corpus())
+    texts = ["payments database cluster", "server node linux", "billing shared queue"]
+    sliced = _search(index, texts, filters, slice_ratio=1.0)
+    masked = _search(index, texts, filters, slice_ratio=0.0)
+
+    assert sliced == masked
+    allowed = set(np.flatnonzero(index.mask(filters)))
+    assert all(row in allowed for hits in sliced for row, _ in hits)
+
+def test_tombstones_never_returned():
+    corpus = _corpus()
+    index = Index.build(corpus)
+    updated = dict(corpus[0], text="payments database cluster replacement host0")
+    index = index.apply({"seq": 1, "updated": [updated], "removed": ["c4", "c8", "c12"]})
+    dead = set(np.flatnonzero(~index.alive))
+    assert len(dead) == 4
+
+    texts = ["payments database cluster", "server host4 node", "shared cluster host8 host12"]
+    for filters in (None, {"service": "payments"}, {"environment": ["prod", "test", "dev"]}):
+        sliced = _search(index, texts, filters, slice_ratio=1.0)
+        masked = _search(index, texts, filters, slice_ratio=0.0)
+        assert sliced == masked
+        assert not dead & {row for hits in sliced for row, _ in hits}
+
+    # The replacement row is found in place of the tombstoned original
+    hits = _search(index, ["replacement host0"], None, slice_ratio=0.25)[0]
+    assert index.meta[hits[0][0]]["sys_id"] == "c0" and hits[0][0] == len(index) - 1